@@ -4,6 +4,7 @@ from database import engine, Base, get_db
 import models # Ensure models are registered
 from sqlalchemy import text
 from routers import projects, upload
+from services import chunked_upload
 
 # Create tables
 Base.metadata.create_all(bind=engine)
@@ -27,6 +28,11 @@ app.add_middleware(
 app.include_router(projects.router)
 app.include_router(upload.router)
 
+@app.on_event("startup")
+def cleanup_upload_sessions():
+    # Remove chunked upload sessions abandoned before the last restart
+    chunked_upload.cleanup_expired_sessions()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to RiSSA Platform API"}
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Request
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 import pandas as pd
@@ -13,7 +14,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import models, schemas
 from database import get_db
-from services import validation
+from services import validation, chunked_upload
 
 router = APIRouter(
     prefix="/projects",
@@ -47,54 +48,29 @@ def generate_eda_report(df: pd.DataFrame, submission_id: int) -> str:
         print(f"EDA report generation failed: {e}")
         return None
 
-@router.post("/{project_id}/submissions")
-async def upload_submission(
-    project_id: int, 
-    center_name: str = Form(...),
-    uploader_name: str = Form(None),
-    file: UploadFile = File(...), 
-    db: Session = Depends(get_db)
-):
-    # 1. Check Project
+def _get_project_schema(project_id: int, db: Session) -> models.Schema:
     project = db.query(models.Project).filter(models.Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="找不到專案")
 
-    # 2. Get Active Schema
     schema = db.query(models.Schema).filter(models.Schema.project_id == project_id).order_by(desc(models.Schema.version)).first()
     if not schema:
         raise HTTPException(status_code=400, detail="PI 尚未設定此專案的 Schema，請先聯繫 PI 設定欄位格式。")
+    return schema
 
-    # 3. Read File
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="格式錯誤: 只允許上傳 CSV 檔案 (.csv)")
-    
-    contents = await file.read()
-    file_size = len(contents)
-    
-    try:
-        df = pd.read_csv(io.BytesIO(contents))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"無法讀取 CSV 檔案，請確認編碼或格式: {str(e)}")
-
-    # Calculate file stats
-    file_stats = {
-        "file_size_bytes": file_size,
-        "file_size_kb": round(file_size / 1024, 2),
-        "row_count": len(df),
-        "column_count": len(df.columns),
-        "column_names": df.columns.tolist()
-    }
-
-    # 4. Sensitive Data Check
+def _check_dataframe(df: pd.DataFrame, schema_structure: dict, validator: validation.IncrementalValidator = None) -> dict:
+    """
+    Rejects sensitive columns and schema violations; returns the validation report.
+    If a validator is given, its per-batch results are merged instead of re-validating df.
+    """
     sensitive_cols = validation.check_sensitive_data(df)
     if sensitive_cols:
         raise HTTPException(status_code=400, detail=f"上傳拒絕: 偵測到敏感個資欄位 ({', '.join(sensitive_cols)})。請移除後再試。")
 
-    # 5. Schema Validation
-    is_valid, report = validation.validate_dataframe(df, schema.structure)
-    
-    status = "validated" if is_valid else "rejected"
+    if validator is not None:
+        is_valid, report = validator.finish(df)
+    else:
+        is_valid, report = validation.validate_dataframe(df, schema_structure)
     if not is_valid:
         error_details = []
         if 'errors' in report:
@@ -102,8 +78,28 @@ async def upload_submission(
         
         detail_msg = "資料驗證失敗:\\n" + "\\n".join(error_details)
         raise HTTPException(status_code=400, detail=detail_msg)
+    return report
 
-    # 6. Check for existing submission from this center
+def _save_submission(
+    db: Session,
+    project_id: int,
+    center_name: str,
+    uploader_name: str,
+    filename: str,
+    df: pd.DataFrame,
+    file_size: int,
+    report: dict
+) -> dict:
+    # Calculate file stats
+    file_stats = {
+        "file_size_bytes": file_size,
+        "file_size_kb": round(file_size / 1024, 2),
+        "row_count": len(df),
+        "column_count": len(df.columns),
+        "column_names": df.columns.tolist()
+    }
+
+    # Check for existing submission from this center
     existing_submission = db.query(models.Submission).filter(
         models.Submission.project_id == project_id,
         models.Submission.center_name == center_name
@@ -113,15 +109,15 @@ async def upload_submission(
         db.delete(existing_submission)
         db.commit()
 
-    # 7. Save Submission
+    # Save Submission
     data_json = df.to_dict(orient="records")
     
     submission = models.Submission(
         project_id=project_id,
         center_name=center_name,
         uploader_name=uploader_name,
-        filename=file.filename,
-        status=status,
+        filename=filename,
+        status="validated",
         validation_report=report,
         data=data_json
     )
@@ -129,7 +125,7 @@ async def upload_submission(
     db.commit()
     db.refresh(submission)
     
-    # 8. Generate EDA Report (async in background would be better, but keeping it simple)
+    # Generate EDA Report (async in background would be better, but keeping it simple)
     eda_report_url = generate_eda_report(df, submission.id)
     
     # Return response with file stats
@@ -146,6 +142,188 @@ async def upload_submission(
         "eda_report_url": eda_report_url
     }
 
+@router.post("/{project_id}/submissions")
+async def upload_submission(
+    project_id: int, 
+    center_name: str = Form(...),
+    uploader_name: str = Form(None),
+    file: UploadFile = File(...), 
+    db: Session = Depends(get_db)
+):
+    # 1. Check Project and get Active Schema
+    schema = _get_project_schema(project_id, db)
+
+    # 2. Read File
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="格式錯誤: 只允許上傳 CSV 檔案 (.csv)")
+    
+    contents = await file.read()
+    file_size = len(contents)
+    
+    try:
+        df = pd.read_csv(io.BytesIO(contents))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"無法讀取 CSV 檔案，請確認編碼或格式: {str(e)}")
+
+    # 3. Sensitive Data Check and Schema Validation
+    report = _check_dataframe(df, schema.structure)
+
+    # 4. Save Submission and generate EDA report
+    return _save_submission(db, project_id, center_name, uploader_name, file.filename, df, file_size, report)
+
+# --- Resumable chunked uploads ---
+# 1. POST   /{project_id}/uploads                      create a session
+# 2. PUT    /{project_id}/uploads/{upload_id}          send the next chunk
+#           (headers: Upload-Offset, Upload-Checksum = hex SHA-256 of the chunk)
+# 3. GET    /{project_id}/uploads/{upload_id}          current offset, used to resume
+# 4. POST   /{project_id}/uploads/{upload_id}/finalize validate and save the submission
+# Chunks are parsed and validated as they arrive. Finalizing reads the staged file
+# once (so stored data matches the single-request upload exactly), merges the
+# per-batch validation results and stores the submission.
+
+def _load_session(project_id: int, upload_id: str) -> dict:
+    try:
+        meta = chunked_upload.get_session(upload_id)
+    except chunked_upload.UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if meta["project_id"] != project_id:
+        raise HTTPException(status_code=404, detail="找不到上傳工作階段，可能已過期，請重新上傳")
+    return meta
+
+def _session_lock(upload_id: str):
+    try:
+        return chunked_upload.session_lock(upload_id)
+    except chunked_upload.UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+def _session_status(meta: dict, state: chunked_upload.SessionState = None) -> dict:
+    return {
+        "upload_id": meta["upload_id"],
+        "filename": meta["filename"],
+        "total_size": meta["total_size"],
+        "offset": meta["offset"],
+        "chunk_size": chunked_upload.CHUNK_SIZE,
+        "rows_parsed": state.parser.rows_parsed if state else None,
+    }
+
+@router.post("/{project_id}/uploads")
+def create_upload_session(
+    project_id: int,
+    upload: schemas.UploadSessionCreate,
+    db: Session = Depends(get_db)
+):
+    chunked_upload.cleanup_expired_sessions()
+
+    schema = _get_project_schema(project_id, db)
+    if not upload.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="格式錯誤: 只允許上傳 CSV 檔案 (.csv)")
+    if upload.total_size <= 0:
+        raise HTTPException(status_code=400, detail="檔案為空")
+    if upload.total_size > chunked_upload.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=f"檔案過大 (上限 {chunked_upload.MAX_UPLOAD_SIZE // (1024 * 1024)} MB)")
+
+    meta = chunked_upload.create_session(
+        project_id=project_id,
+        center_name=upload.center_name,
+        uploader_name=upload.uploader_name,
+        filename=upload.filename,
+        total_size=upload.total_size,
+        schema_structure=schema.structure,
+    )
+    return _session_status(meta)
+
+@router.get("/{project_id}/uploads/{upload_id}")
+def get_upload_session(project_id: int, upload_id: str):
+    meta = _load_session(project_id, upload_id)
+    return _session_status(meta)
+
+# Errors meaning the uploaded bytes are not a readable CSV (as opposed to I/O failures)
+CSV_PARSE_ERRORS = (pd.errors.ParserError, UnicodeDecodeError, ValueError)
+
+def _append_chunk(project_id: int, upload_id: str, offset: int, data: bytes, checksum: str) -> dict:
+    """Blocking part of upload_chunk: checksum, disk write, parsing, validation and header checks."""
+    with _session_lock(upload_id):
+        meta = _load_session(project_id, upload_id)
+
+        try:
+            had_header = chunked_upload.get_state(meta).parser.columns is not None
+            state = chunked_upload.append_chunk(meta, offset, data, checksum)
+            parser = state.parser
+        except chunked_upload.UploadSessionError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except CSV_PARSE_ERRORS as e:
+            chunked_upload.delete_session(upload_id)
+            raise HTTPException(status_code=400, detail=f"無法讀取 CSV 檔案，請確認編碼或格式: {str(e)}")
+
+        # Reject sensitive or missing columns as soon as the header arrives
+        if not had_header and parser.columns is not None:
+            try:
+                _check_dataframe(parser.header_frame(), meta["schema_structure"])
+            except HTTPException:
+                chunked_upload.delete_session(upload_id)
+                raise
+
+        return _session_status(meta, state)
+
+@router.put("/{project_id}/uploads/{upload_id}")
+async def upload_chunk(
+    project_id: int,
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    upload_checksum: str = Header(...)
+):
+    # Refuse oversized chunks before buffering them
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > chunked_upload.MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail="區塊過大")
+
+    # Content-Length may be absent (chunked transfer encoding), so enforce the limit while reading too
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > chunked_upload.MAX_CHUNK_SIZE:
+            raise HTTPException(status_code=413, detail="區塊過大")
+    data = bytes(data)
+
+    # Hashing, writing and parsing block; keep them off the event loop so other uploads proceed
+    return await run_in_threadpool(_append_chunk, project_id, upload_id, upload_offset, data, upload_checksum)
+
+@router.post("/{project_id}/uploads/{upload_id}/finalize")
+def finalize_upload(project_id: int, upload_id: str, db: Session = Depends(get_db)):
+    with _session_lock(upload_id):
+        meta = _load_session(project_id, upload_id)
+        if meta["offset"] != meta["total_size"]:
+            raise HTTPException(status_code=409, detail=f"檔案尚未上傳完成 ({meta['offset']}/{meta['total_size']} bytes)")
+
+        try:
+            state = chunked_upload.get_state(meta)
+            try:
+                state.parser.finish()
+                df = chunked_upload.read_staged_file(meta)
+            except CSV_PARSE_ERRORS as e:
+                raise HTTPException(status_code=400, detail=f"無法讀取 CSV 檔案，請確認編碼或格式: {str(e)}")
+
+            report = _check_dataframe(df, meta["schema_structure"], state.validator)
+            result = _save_submission(
+                db, project_id, meta["center_name"], meta["uploader_name"],
+                meta["filename"], df, meta["total_size"], report
+            )
+        except HTTPException as e:
+            # The file itself was rejected; keep the session on server errors so finalize can be retried
+            if 400 <= e.status_code < 500:
+                chunked_upload.delete_session(upload_id)
+            raise
+
+        chunked_upload.delete_session(upload_id)
+        return result
+
+@router.delete("/{project_id}/uploads/{upload_id}")
+def abort_upload(project_id: int, upload_id: str):
+    _load_session(project_id, upload_id)
+    chunked_upload.delete_session(upload_id)
+    return {"message": "已取消上傳"}
+
 @router.get("/reports/{filename}")
 async def get_eda_report(filename: str):
     """Serve EDA report HTML file."""
@@ -49,3 +49,9 @@ class SubmissionResponse(SubmissionBase):
 
     class Config:
         from_attributes = True
+
+class UploadSessionCreate(BaseModel):
+    center_name: str
+    uploader_name: Optional[str] = None
+    filename: str
+    total_size: int
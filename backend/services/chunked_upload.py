@@ -0,0 +1,380 @@
+import pandas as pd
+import codecs
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional
+
+from services import validation
+
+# Directory used to stage chunks of in-progress uploads
+UPLOADS_DIR = Path(__file__).parent.parent / "uploads"
+UPLOADS_DIR.mkdir(exist_ok=True)
+
+# Sessions untouched for longer than this are removed by cleanup_expired_sessions()
+SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24")) * 3600
+
+# Suggested chunk size returned to clients when a session is created
+CHUNK_SIZE = 5 * 1024 * 1024
+
+# Largest chunk body accepted, leaving slack for clients that round chunk sizes up
+MAX_CHUNK_SIZE = CHUNK_SIZE + 1024 * 1024
+
+# Largest file a session may declare
+MAX_UPLOAD_SIZE = int(os.getenv("UPLOAD_MAX_SIZE_MB", "1024")) * 1024 * 1024
+
+# Block size used when replaying staged data from disk
+_REPLAY_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class UploadSessionError(Exception):
+    """Raised for invalid upload session operations; carries an HTTP status code."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# Bytes after which a '"' opens a quoted field (pandas only honours quotes at field start)
+_FIELD_START_BYTES = b",\n\r"
+
+
+def _record_end(buf: bytes, start: int) -> int:
+    """Returns the index of the newline ending the record that starts at buf[start], or -1."""
+    pos = start
+    in_quotes = False
+    while True:
+        quote = buf.find(b'"', pos)
+        if in_quotes:
+            if quote < 0:
+                return -1
+            if buf[quote + 1:quote + 2] == b'"':
+                pos = quote + 2
+            else:
+                in_quotes = False
+                pos = quote + 1
+            continue
+
+        newline = buf.find(b"\n", pos, len(buf) if quote < 0 else quote)
+        if newline >= 0:
+            return newline
+        if quote < 0:
+            return -1
+        if quote == start or buf[quote - 1] in _FIELD_START_BYTES:
+            in_quotes = True
+        pos = quote + 1
+
+
+class IncrementalCsvParser:
+    """
+    Parses a CSV file as it arrives in arbitrary byte chunks.
+
+    Complete records are parsed into DataFrame batches as soon as they are
+    available and passed to on_batch; a trailing partial record is held back
+    until the next chunk. Batches are not kept: each one infers its own dtypes,
+    so the file itself must be read with a single pd.read_csv once complete.
+
+    Every batch after the first is parsed behind the header and the file's
+    first data row (dropped again afterwards), so pandas applies the same
+    field-count rules to it as to the whole file: extra fields raise, and an
+    implicit index column is only inferred if the first row has one.
+
+    Record boundaries are found by a quote-aware scanner whose state is kept
+    between feed() calls, so each byte is scanned once.
+    """
+
+    def __init__(self, on_batch: Optional[Callable[[pd.DataFrame], None]] = None):
+        self.header: Optional[bytes] = None
+        self.columns: Optional[List[str]] = None
+        self.on_batch = on_batch
+        self.rows_parsed = 0
+        self.bytes_fed = 0
+        # First data record, prepended to later batches
+        self._first_row: Optional[bytes] = None
+        # Unparsed data; always starts at the beginning of a record
+        self._pending = b""
+        # Scanner state: resume position in _pending and whether it is inside a quoted field
+        self._scan_pos = 0
+        self._in_quotes = False
+        # First and last record-ending newlines found in _pending so far
+        self._first_newline = -1
+        self._last_newline = -1
+
+    def _scan(self) -> None:
+        buf = self._pending
+        pos = self._scan_pos
+        while True:
+            quote = buf.find(b'"', pos)
+
+            if self._in_quotes:
+                if quote < 0:
+                    pos = len(buf)
+                    break
+                if quote + 1 == len(buf):
+                    # Can't tell a closing quote from an escaped "" yet
+                    pos = quote
+                    break
+                if buf[quote + 1] == ord('"'):
+                    pos = quote + 2
+                else:
+                    self._in_quotes = False
+                    pos = quote + 1
+                continue
+
+            end = len(buf) if quote < 0 else quote
+            if self._first_newline < 0:
+                self._first_newline = buf.find(b"\n", pos, end)
+            newline = buf.rfind(b"\n", pos, end)
+            if newline >= 0:
+                self._last_newline = newline
+            if quote < 0:
+                pos = len(buf)
+                break
+
+            at_field_start = (
+                quote == 0
+                or buf[quote - 1] in _FIELD_START_BYTES
+                or (quote == 3 and self.header is None and buf.startswith(codecs.BOM_UTF8))
+            )
+            if at_field_start:
+                self._in_quotes = True
+            pos = quote + 1
+        self._scan_pos = pos
+
+    def feed(self, data: bytes) -> None:
+        self.bytes_fed += len(data)
+        self._pending += data
+        self._scan()
+        if self._last_newline < 0:
+            return
+
+        buf = self._pending
+        cut = self._last_newline + 1
+        start = 0
+        if self.header is None:
+            start = self._first_newline + 1
+            self.header = buf[:start]
+            self.columns = pd.read_csv(io.BytesIO(self.header)).columns.tolist()
+
+        self._pending = buf[cut:]
+        self._scan_pos -= cut
+        self._first_newline = self._last_newline = -1
+        if cut > start:
+            self._parse(buf[start:cut])
+
+    def _parse(self, rows: bytes) -> None:
+        if not rows.strip():
+            return
+        if self._first_row is None:
+            # Blank lines before the first row are skipped by pandas too
+            start = len(rows) - len(rows.lstrip(b"\r\n"))
+            end = _record_end(rows, start)
+            self._first_row = rows[start:end + 1] if end >= 0 else rows[start:] + b"\n"
+            df = pd.read_csv(io.BytesIO(self.header + rows))
+        else:
+            df = pd.read_csv(io.BytesIO(self.header + self._first_row + rows)).iloc[1:]
+
+        self.rows_parsed += len(df)
+        if self.on_batch is not None and len(df):
+            self.on_batch(df)
+
+    def finish(self) -> None:
+        """Parses any remaining data once the whole file has been fed."""
+        if self.header is None:
+            # File without a trailing newline after the header (or empty file)
+            self.header, self._pending = self._pending, b""
+            self.columns = pd.read_csv(io.BytesIO(self.header)).columns.tolist()
+        if self._pending:
+            self._parse(self._pending)
+            self._pending = b""
+
+    def header_frame(self) -> Optional[pd.DataFrame]:
+        """Returns an empty DataFrame with the file's columns once the header is known."""
+        if self.columns is None:
+            return None
+        return pd.DataFrame(columns=self.columns)
+
+
+class SessionState:
+    """In-memory parsing and validation progress of one upload session."""
+
+    def __init__(self, schema_structure: Dict[str, Any]):
+        self.validator = validation.IncrementalValidator(schema_structure)
+        self.parser = IncrementalCsvParser(on_batch=self.validator.add_batch)
+
+
+# State of active sessions, keyed by upload id
+_states: Dict[str, SessionState] = {}
+
+# Per-session locks serializing chunk appends and finalization across worker threads
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _is_valid_upload_id(upload_id: str) -> bool:
+    return len(upload_id) == 32 and upload_id.isalnum()
+
+
+def session_lock(upload_id: str) -> threading.Lock:
+    """Returns the lock for an existing session; locks are never created for unknown ids."""
+    with _locks_guard:
+        if upload_id not in _locks:
+            if not _is_valid_upload_id(upload_id) or not _session_dir(upload_id).is_dir():
+                raise UploadSessionError(404, "找不到上傳工作階段，可能已過期，請重新上傳")
+            _locks[upload_id] = threading.Lock()
+        return _locks[upload_id]
+
+
+def _session_dir(upload_id: str) -> Path:
+    return UPLOADS_DIR / upload_id
+
+
+def _write_meta(meta: Dict[str, Any]) -> None:
+    session_dir = _session_dir(meta["upload_id"])
+    tmp_path = session_dir / "meta.json.tmp"
+    tmp_path.write_text(json.dumps(meta, ensure_ascii=False))
+    os.replace(tmp_path, session_dir / "meta.json")
+
+
+def create_session(
+    project_id: int,
+    center_name: str,
+    uploader_name: Optional[str],
+    filename: str,
+    total_size: int,
+    schema_structure: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Creates a new upload session staged on local disk and returns its metadata."""
+    upload_id = uuid.uuid4().hex
+    session_dir = _session_dir(upload_id)
+    session_dir.mkdir(parents=True)
+    (session_dir / "data.part").touch()
+
+    now = time.time()
+    meta = {
+        "upload_id": upload_id,
+        "project_id": project_id,
+        "center_name": center_name,
+        "uploader_name": uploader_name,
+        "filename": filename,
+        "total_size": total_size,
+        "offset": 0,
+        "schema_structure": schema_structure,
+        "created_at": now,
+        "updated_at": now,
+    }
+    _write_meta(meta)
+    _states[upload_id] = SessionState(schema_structure)
+    return meta
+
+
+def get_session(upload_id: str) -> Dict[str, Any]:
+    """Loads session metadata, raising UploadSessionError if it does not exist or has expired."""
+    if not _is_valid_upload_id(upload_id) or not (_session_dir(upload_id) / "meta.json").exists():
+        _forget_session(upload_id)
+        raise UploadSessionError(404, "找不到上傳工作階段，可能已過期，請重新上傳")
+
+    meta = json.loads((_session_dir(upload_id) / "meta.json").read_text())
+    if time.time() - meta["updated_at"] > SESSION_TTL_SECONDS:
+        delete_session(upload_id)
+        raise UploadSessionError(404, "找不到上傳工作階段，可能已過期，請重新上傳")
+    return meta
+
+
+def get_state(meta: Dict[str, Any]) -> SessionState:
+    """
+    Returns the state of a session, caught up with everything staged on disk.
+    The state is rebuilt from the staged file if this process has not seen the
+    session before (e.g. after a restart or on another worker).
+    """
+    upload_id = meta["upload_id"]
+    state = _states.get(upload_id)
+    if state is None or state.parser.bytes_fed > meta["offset"]:
+        state = SessionState(meta["schema_structure"])
+        _states[upload_id] = state
+    parser = state.parser
+
+    if parser.bytes_fed < meta["offset"]:
+        with open(_session_dir(upload_id) / "data.part", "rb") as f:
+            f.seek(parser.bytes_fed)
+            remaining = meta["offset"] - parser.bytes_fed
+            while remaining > 0:
+                block = f.read(min(_REPLAY_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                parser.feed(block)
+                remaining -= len(block)
+    return state
+
+
+def append_chunk(meta: Dict[str, Any], offset: int, data: bytes, checksum: str) -> SessionState:
+    """
+    Verifies and appends a chunk at the given offset, feeds it to the session's
+    parser and returns the session state. Chunks must be sent in order; a client that
+    lost track of its position should re-read the session offset and resume there.
+    Callers must hold session_lock() for the session.
+    """
+    if offset != meta["offset"]:
+        raise UploadSessionError(409, f"上傳位置不符 (伺服器目前位置: {meta['offset']})")
+    if offset + len(data) > meta["total_size"]:
+        raise UploadSessionError(400, "區塊超出檔案大小")
+    if hashlib.sha256(data).hexdigest() != checksum.strip().lower():
+        raise UploadSessionError(400, "區塊檢查碼不符，請重新傳送此區塊")
+
+    # Catch up before writing so the parser never sees this chunk twice
+    state = get_state(meta)
+
+    with open(_session_dir(meta["upload_id"]) / "data.part", "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+        f.truncate()
+
+    meta["offset"] = offset + len(data)
+    meta["updated_at"] = time.time()
+    _write_meta(meta)
+
+    state.parser.feed(data)
+    return state
+
+
+def read_staged_file(meta: Dict[str, Any]) -> pd.DataFrame:
+    """Reads the complete staged file exactly as the single-request upload reads its body."""
+    return pd.read_csv(_session_dir(meta["upload_id"]) / "data.part")
+
+
+def _forget_session(upload_id: str) -> None:
+    _states.pop(upload_id, None)
+    with _locks_guard:
+        _locks.pop(upload_id, None)
+
+
+def delete_session(upload_id: str) -> None:
+    _forget_session(upload_id)
+    if _is_valid_upload_id(upload_id):
+        shutil.rmtree(_session_dir(upload_id), ignore_errors=True)
+
+
+def cleanup_expired_sessions() -> int:
+    """Removes sessions that have not received data within the TTL. Returns the number removed."""
+    removed = 0
+    now = time.time()
+    for session_dir in UPLOADS_DIR.iterdir():
+        if not session_dir.is_dir():
+            continue
+        meta_path = session_dir / "meta.json"
+        try:
+            updated_at = json.loads(meta_path.read_text())["updated_at"]
+        except (OSError, ValueError, KeyError):
+            # Half-created or corrupted session; fall back to directory mtime
+            updated_at = session_dir.stat().st_mtime
+        if now - updated_at > SESSION_TTL_SECONDS:
+            delete_session(session_dir.name)
+            removed += 1
+    return removed
@@ -17,6 +17,173 @@ def check_sensitive_data(df: pd.DataFrame) -> List[str]:
             sensitive_found.append(col)
     return sensitive_found
 
+# Error labels for the supported column types
+TYPE_LABELS = {"int": "整數", "integer": "整數", "float": "數值", "datetime": "日期", "date": "日期"}
+
+def _check_type(non_null: pd.Series, t: str) -> Tuple[bool, bool]:
+    """Returns (valid, raised) for one candidate type; raised means the values could not be converted."""
+    if t in ["int", "integer"]:
+        try:
+            if not pd.api.types.is_numeric_dtype(non_null):
+                numeric_vals = pd.to_numeric(non_null, errors='raise')
+            else:
+                numeric_vals = non_null
+            
+            # Check for decimals (should be integers)
+            return all(numeric_vals == numeric_vals.astype(int)), False
+        except (ValueError, TypeError):
+            return False, True
+    
+    elif t == "float":
+        try:
+            if not pd.api.types.is_numeric_dtype(non_null):
+                pd.to_numeric(non_null, errors='raise')
+            return True, False
+        except (ValueError, TypeError):
+            return False, True
+    
+    elif t in ["datetime", "date"]:
+        try:
+            pd.to_datetime(non_null, errors='raise')
+            return True, False
+        except (ValueError, TypeError):
+            return False, True
+    
+    return False, False
+
+def _column_stats(non_null: pd.Series, col_def: Dict[str, Any], all_types: bool = False) -> Dict[str, Any]:
+    """
+    Runs the checks for one column's non-null values and returns their raw results.
+    With all_types=True every check is evaluated so results from several batches
+    can be merged with _merge_column_stats; otherwise evaluation stops where
+    validate_dataframe would.
+    """
+    col_type = col_def.get("type", "string")
+    min_val = col_def.get("min")
+    max_val = col_def.get("max")
+    allowed_values = col_def.get("allowed_values")
+    format_pattern = col_def.get("format")
+    stats = {"types": None}
+    
+    # 1. Type validation (supports single type or array of types)
+    col_types = col_type if isinstance(col_type, list) else [col_type]
+    
+    # Skip type validation for 'any' or 'string' (always passes)
+    if 'any' not in col_types and 'string' not in col_types:
+        stats["types"] = []
+        for t in col_types:
+            valid, raised = _check_type(non_null, t)
+            stats["types"].append([valid, raised])
+            if valid and not all_types:
+                break
+        if not all_types and not any(valid for valid, _ in stats["types"]):
+            return stats  # Skip remaining checks if type is wrong
+    
+    # 2. Range validation (min/max): [below_min, above_max], None where the comparison failed
+    if col_type in ["int", "integer", "float"] and (min_val is not None or max_val is not None):
+        below = above = None
+        try:
+            numeric_vals = pd.to_numeric(non_null, errors='coerce')
+            below = int((numeric_vals < min_val).sum()) if min_val is not None else 0
+            above = int((numeric_vals > max_val).sum()) if max_val is not None else 0
+        except Exception:
+            pass  # Already reported type error
+        stats["range"] = [below, above]
+    
+    # 3. Allowed values validation (enum/categorical): first 5 unique invalid values
+    if allowed_values is not None and len(allowed_values) > 0:
+        # Convert to string for comparison
+        str_values = non_null.astype(str)
+        allowed_str = [str(v) for v in allowed_values]
+        
+        invalid_mask = ~str_values.isin(allowed_str)
+        stats["invalid_values"] = list(str_values[invalid_mask].unique()[:5])
+    
+    # 4. Format validation (regex pattern): [invalid count, first 3 invalid values], None if the pattern is invalid
+    if format_pattern is not None:
+        try:
+            pattern = re.compile(format_pattern)
+            str_values = non_null.astype(str)
+            
+            def check_format(val):
+                return bool(pattern.match(str(val)))
+            
+            invalid_mask = ~str_values.apply(check_format)
+            stats["format"] = [int(invalid_mask.sum()), str_values[invalid_mask].head(3).tolist()]
+        except re.error:
+            stats["format"] = None
+    
+    return stats
+
+def _merge_column_stats(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Combines the all_types=True stats of two consecutive batches of the same column."""
+    merged = {"types": None}
+    if a["types"] is not None:
+        merged["types"] = [[va and vb, ra or rb] for (va, ra), (vb, rb) in zip(a["types"], b["types"])]
+    if "range" in a:
+        merged["range"] = [None if x is None or y is None else x + y for x, y in zip(a["range"], b["range"])]
+    if "invalid_values" in a:
+        merged["invalid_values"] = list(dict.fromkeys(a["invalid_values"] + b["invalid_values"]))[:5]
+    if "format" in a:
+        merged["format"] = None if a["format"] is None else [a["format"][0] + b["format"][0], (a["format"][1] + b["format"][1])[:3]]
+    return merged
+
+def _column_messages(col_name: str, col_def: Dict[str, Any], stats: Dict[str, Any], errors: List[str], warnings: List[str]) -> None:
+    """Turns a column's check results into error and warning messages."""
+    col_type = col_def.get("type", "string")
+    min_val = col_def.get("min")
+    max_val = col_def.get("max")
+    allowed_values = col_def.get("allowed_values")
+    format_pattern = col_def.get("format")
+    col_types = col_type if isinstance(col_type, list) else [col_type]
+    
+    if stats["types"] is not None:
+        type_valid = False
+        type_errors = []
+        for t, (valid, raised) in zip(col_types, stats["types"]):
+            if valid:
+                type_valid = True
+                break
+            if raised:
+                type_errors.append(TYPE_LABELS[t])
+        
+        if not type_valid:
+            expected = "/".join(type_errors) if type_errors else "/".join(col_types)
+            errors.append(f"欄位 {col_name} 類型錯誤 (預期: {expected})")
+            return  # Skip range check if type is wrong
+    
+    if "range" in stats:
+        below, above = stats["range"]
+        if below:
+            errors.append(f"欄位 {col_name} 有 {below} 筆值小於最小值 {min_val}")
+        if above:
+            errors.append(f"欄位 {col_name} 有 {above} 筆值大於最大值 {max_val}")
+    
+    if stats.get("invalid_values"):
+        errors.append(f"欄位 {col_name} 包含無效值: {stats['invalid_values']} (允許值: {allowed_values})")
+    
+    if "format" in stats:
+        if stats["format"] is None:
+            warnings.append(f"欄位 {col_name} 的格式規則無效: {format_pattern}")
+        elif stats["format"][0]:
+            count, sample_invalid = stats["format"]
+            errors.append(f"欄位 {col_name} 有 {count} 筆值格式錯誤 (格式: {format_pattern}, 例: {sample_invalid})")
+
+def _build_report(errors: List[str], warnings: List[str], schema_columns: List[Dict[str, Any]], df: pd.DataFrame) -> Tuple[bool, Dict[str, Any]]:
+    is_valid = len(errors) == 0
+    
+    report = {
+        "errors": errors,
+        "warnings": warnings,
+        "stats": {
+            "columns_validated": len(schema_columns),
+            "columns_in_file": len(set(df.columns)),
+            "rows": len(df)
+        }
+    }
+    
+    return is_valid, report
+
 def validate_dataframe(df: pd.DataFrame, schema_structure: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
     """
     Validates the dataframe against the schema using Pandas.
@@ -44,13 +211,8 @@ def validate_dataframe(df: pd.DataFrame, schema_structure: Dict[str, Any]) -> Tu
     for col_def in schema_columns:
         col_name = col_def.get("name")
         required = col_def.get("required", False)
-        col_type = col_def.get("type", "string")
-        min_val = col_def.get("min")
-        max_val = col_def.get("max")
-        allowed_values = col_def.get("allowed_values")
-        format_pattern = col_def.get("format")
         
-        # 1. Check if required column exists
+        # Check if required column exists
         if required and col_name not in df_columns:
             errors.append(f"缺少必要欄位: {col_name}")
             continue
@@ -63,111 +225,93 @@ def validate_dataframe(df: pd.DataFrame, schema_structure: Dict[str, Any]) -> Tu
         if len(non_null) == 0:
             continue  # All values are null, skip validation
         
-        # 2. Type validation (supports single type or array of types)
-        col_types = col_type if isinstance(col_type, list) else [col_type]
-        
-        # Skip type validation for 'any' or 'string' (always passes)
-        if 'any' in col_types or 'string' in col_types:
-            type_valid = True
-        else:
-            type_valid = False
-            type_errors = []
-            
-            for t in col_types:
-                if t in ["int", "integer"]:
-                    try:
-                        if not pd.api.types.is_numeric_dtype(non_null):
-                            numeric_vals = pd.to_numeric(non_null, errors='raise')
-                        else:
-                            numeric_vals = non_null
-                        
-                        # Check for decimals (should be integers)
-                        if all(numeric_vals == numeric_vals.astype(int)):
-                            type_valid = True
-                            break
-                    except (ValueError, TypeError):
-                        type_errors.append("整數")
-                
-                elif t == "float":
-                    try:
-                        if not pd.api.types.is_numeric_dtype(non_null):
-                            pd.to_numeric(non_null, errors='raise')
-                        type_valid = True
-                        break
-                    except (ValueError, TypeError):
-                        type_errors.append("數值")
-                
-                elif t in ["datetime", "date"]:
-                    try:
-                        pd.to_datetime(non_null, errors='raise')
-                        type_valid = True
-                        break
-                    except (ValueError, TypeError):
-                        type_errors.append("日期")
+        _column_messages(col_name, col_def, _column_stats(non_null, col_def), errors, warnings)
+    
+    return _build_report(errors, warnings, schema_columns, df)
+
+def _column_kind(column: pd.Series) -> Tuple[str, Any]:
+    if column.dtype == object:
+        return "object", pd.api.types.infer_dtype(column, skipna=True)
+    return str(column.dtype), None
+
+def _is_mergeable(col_def: Dict[str, Any]) -> bool:
+    """Date parsing infers its format from the first value, so per-batch results can differ from the whole column."""
+    col_type = col_def.get("type", "string")
+    col_types = col_type if isinstance(col_type, list) else [col_type]
+    if 'any' in col_types or 'string' in col_types:
+        return True
+    return not any(t in ["datetime", "date"] for t in col_types)
+
+class IncrementalValidator:
+    """
+    Runs the validate_dataframe column checks batch by batch while a file is
+    still being uploaded.
+
+    Batches are parsed separately, so their dtypes can differ from a whole-file
+    read (e.g. "007" in an all-numeric batch). finish() therefore reuses merged
+    batch results only for columns whose dtype matches the whole file in every
+    batch, and re-checks the remaining columns on the whole DataFrame. The
+    report is identical to validate_dataframe(df, schema_structure).
+    """
+
+    def __init__(self, schema_structure: Dict[str, Any]):
+        self.schema_structure = schema_structure
+        self.rows = 0
+        self._stats: Dict[int, Dict[str, Any]] = {}
+        self._kinds: Dict[int, set] = {}
+
+    def add_batch(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        for i, col_def in enumerate(self.schema_structure.get("columns", [])):
+            col_name = col_def.get("name")
+            if col_name not in df.columns or not _is_mergeable(col_def):
+                continue
+            non_null = df[col_name].dropna()
+            if len(non_null) == 0:
+                continue
             
-            if not type_valid:
-                expected = "/".join(type_errors) if type_errors else "/".join(col_types)
-                errors.append(f"欄位 {col_name} 類型錯誤 (預期: {expected})")
-                continue  # Skip range check if type is wrong
+            self._kinds.setdefault(i, set()).add(_column_kind(df[col_name]))
+            stats = _column_stats(non_null, col_def, all_types=True)
+            self._stats[i] = stats if i not in self._stats else _merge_column_stats(self._stats[i], stats)
 
+    def finish(self, df: pd.DataFrame) -> Tuple[bool, Dict[str, Any]]:
+        """Returns (is_valid, report) for the whole-file DataFrame the batches came from."""
+        if "columns" not in self.schema_structure:
+            return validate_dataframe(df, self.schema_structure)
         
-        # 3. Range validation (min/max)
-        if col_type in ["int", "integer", "float"] and (min_val is not None or max_val is not None):
-            try:
-                numeric_vals = pd.to_numeric(non_null, errors='coerce')
-                
-                if min_val is not None:
-                    below_min = numeric_vals < min_val
-                    if below_min.any():
-                        count = below_min.sum()
-                        errors.append(f"欄位 {col_name} 有 {count} 筆值小於最小值 {min_val}")
-                
-                if max_val is not None:
-                    above_max = numeric_vals > max_val
-                    if above_max.any():
-                        count = above_max.sum()
-                        errors.append(f"欄位 {col_name} 有 {count} 筆值大於最大值 {max_val}")
-            except Exception:
-                pass  # Already reported type error above
+        errors = []
+        warnings = []
+        schema_columns = self.schema_structure["columns"]
+        df_columns = set(df.columns)
+        # Batches that don't add up to the file mean the merged results can't be trusted
+        batches_complete = self.rows == len(df)
         
-        # 4. Allowed values validation (enum/categorical)
-        if allowed_values is not None and len(allowed_values) > 0:
-            # Convert to string for comparison
-            str_values = non_null.astype(str)
-            allowed_str = [str(v) for v in allowed_values]
+        for i, col_def in enumerate(schema_columns):
+            col_name = col_def.get("name")
+            required = col_def.get("required", False)
             
-            invalid_mask = ~str_values.isin(allowed_str)
-            if invalid_mask.any():
-                invalid_values = str_values[invalid_mask].unique()[:5]  # Show first 5 unique invalid values
-                errors.append(f"欄位 {col_name} 包含無效值: {list(invalid_values)} (允許值: {allowed_values})")
+            if required and col_name not in df_columns:
+                errors.append(f"缺少必要欄位: {col_name}")
+                continue
+            
+            if col_name not in df_columns:
+                continue
+            
+            non_null = df[col_name].dropna()
+            if len(non_null) == 0:
+                continue
+            
+            kind = _column_kind(df[col_name])
+            stats = self._stats.get(i)
+            reusable = (
+                batches_complete
+                and stats is not None
+                and self._kinds[i] == {kind}
+                and (kind[0] != "object" or kind[1] == "string")
+            )
+            if not reusable:
+                stats = _column_stats(non_null, col_def)
+            
+            _column_messages(col_name, col_def, stats, errors, warnings)
         
-        # 5. Format validation (regex pattern)
-        if format_pattern is not None:
-            try:
-                pattern = re.compile(format_pattern)
-                str_values = non_null.astype(str)
-                
-                def check_format(val):
-                    return bool(pattern.match(str(val)))
-                
-                invalid_mask = ~str_values.apply(check_format)
-                if invalid_mask.any():
-                    count = invalid_mask.sum()
-                    sample_invalid = str_values[invalid_mask].head(3).tolist()
-                    errors.append(f"欄位 {col_name} 有 {count} 筆值格式錯誤 (格式: {format_pattern}, 例: {sample_invalid})")
-            except re.error as e:
-                warnings.append(f"欄位 {col_name} 的格式規則無效: {format_pattern}")
-    
-    is_valid = len(errors) == 0
-    
-    report = {
-        "errors": errors,
-        "warnings": warnings,
-        "stats": {
-            "columns_validated": len(schema_columns),
-            "columns_in_file": len(df_columns),
-            "rows": len(df)
-        }
-    }
-    
-    return is_valid, report
+        return _build_report(errors, warnings, schema_columns, df)
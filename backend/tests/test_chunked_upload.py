@@ -0,0 +1,108 @@
+import io
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.chunked_upload import IncrementalCsvParser
+
+CHUNK_SIZES = [1, 2, 3, 7, 64, 1024 * 1024]
+
+CSV_CASES = {
+    "plain": b"a,b,c\n1,x,0.5\n2,y,1.5\n",
+    "quoted_newline": b'a,b\nr1,"p\nq"\nr2,"line1\nline2\nline3"\n',
+    "escaped_quotes": b'a,b\n1,"say ""hi""\n, ok"\n2,"""quoted"""\n',
+    "quote_inside_unquoted": b'a,b\nr1,5"x\nr2,"p\nq"\nr3,z\n',
+    "crlf": b'a,b\r\n1,"x\r\ny"\r\n2,z\r\n',
+    "bom": b'\xef\xbb\xbf"a",b\n1,"x\ny"\n2,z\n',
+    "no_trailing_newline": b'a,b\n1,x\n2,"y\nz"',
+    "header_only": b"a,b,c\n",
+    "header_only_no_newline": b"a,b,c",
+    "quoted_header": b'"col\nA",b\n1,2\n',
+    "utf8": "中心,數值\n高雄,1\n台中,2\n".encode("utf-8"),
+    "ragged_row": b"a,b\n1,2\n3,4\n5,6,7\n",
+    "implicit_index": b"a,b\n1,2,3\n4,5,6\n7,8\n",
+    "implicit_index_ragged": b"a,b\n1,2,3\n4,5,6,7\n",
+    "short_row": b"a,b,c\n1,2,3\n4\n",
+    "leading_blank_lines": b"a,b\n\n\n1,2\n3,4\n",
+}
+
+
+def _parse_in_chunks(data: bytes, chunk_size: int) -> pd.DataFrame:
+    """Feeds data in chunks and returns the concatenated batches."""
+    batches = []
+    parser = IncrementalCsvParser(on_batch=batches.append)
+    for i in range(0, len(data), chunk_size):
+        parser.feed(data[i:i + chunk_size])
+    parser.finish()
+    assert parser.rows_parsed == sum(len(b) for b in batches)
+    if not batches:
+        return pd.read_csv(io.BytesIO(parser.header))
+    return pd.concat(batches).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("name", CSV_CASES)
+def test_matches_read_csv(name, chunk_size):
+    data = CSV_CASES[name]
+    try:
+        expected = pd.read_csv(io.BytesIO(data)).reset_index(drop=True)
+    except pd.errors.ParserError:
+        with pytest.raises(pd.errors.ParserError):
+            _parse_in_chunks(data, chunk_size)
+        return
+    result = _parse_in_chunks(data, chunk_size)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_extra_field_at_batch_start_raises():
+    parser = IncrementalCsvParser()
+    parser.feed(b"a,b\n1,2\n")
+    with pytest.raises(pd.errors.ParserError):
+        parser.feed(b"3,4,5\n")
+
+
+def test_batches_keep_only_their_own_rows():
+    batches = []
+    parser = IncrementalCsvParser(on_batch=batches.append)
+    parser.feed(b"code,v\n007,1\n")
+    parser.feed(b"008,2\nA12,3\n")
+    parser.finish()
+    assert [len(b) for b in batches] == [1, 2]
+    assert batches[1]["code"].tolist() == ["008", "A12"]
+
+
+def test_header_available_before_rows():
+    parser = IncrementalCsvParser()
+    parser.feed(b"a,b\n1,")
+    assert parser.columns == ["a", "b"]
+    assert list(parser.header_frame().columns) == ["a", "b"]
+    assert parser.rows_parsed == 0
+
+
+def test_rows_parsed_incrementally():
+    parser = IncrementalCsvParser()
+    parser.feed(b'a,b\n1,x\n2,"y\n')
+    assert parser.rows_parsed == 1
+    parser.feed(b'z"\n3,w\n')
+    assert parser.rows_parsed == 3
+
+
+def test_stray_quote_scans_linearly():
+    rows = "".join(f"{i},row {i}\n" for i in range(20000))
+    data = ("a,b\n1,5\" tall\n" + rows).encode()
+    start = time.perf_counter()
+    result = _parse_in_chunks(data, 1024)
+    assert time.perf_counter() - start < 5
+    pd.testing.assert_frame_equal(result, pd.read_csv(io.BytesIO(data)))
+
+
+def test_unclosed_quote_raises_on_finish():
+    parser = IncrementalCsvParser()
+    parser.feed(b'a,b\n1,"open\n2,x\n')
+    with pytest.raises(pd.errors.ParserError):
+        parser.finish()
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import models
+from database import Base, get_db
+from routers import upload
+from services import chunked_upload
+
+SCHEMA = {"columns": [{"name": "code", "type": "string"}, {"name": "v", "type": "int", "min": 0}]}
+
+MIXED_CSV = b"code,v\n007,1\n008,2\nA12,3\n"
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = factory()
+    project = models.Project(name="RiSSA")
+    db.add(project)
+    db.commit()
+    db.add(models.Schema(project_id=project.id, structure=SCHEMA, version=1))
+    db.commit()
+    db.close()
+    return factory
+
+
+@pytest.fixture
+def client(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(chunked_upload, "UPLOADS_DIR", tmp_path)
+    monkeypatch.setattr(upload, "generate_eda_report", lambda df, submission_id: None)
+
+    app = FastAPI()
+    app.include_router(upload.router)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app, raise_server_exceptions=False)
+    chunked_upload._states.clear()
+    chunked_upload._locks.clear()
+
+
+def _create(client, data, center_name="高雄榮總"):
+    res = client.post("/projects/1/uploads", json={
+        "center_name": center_name,
+        "uploader_name": "tester",
+        "filename": "data.csv",
+        "total_size": len(data),
+    })
+    assert res.status_code == 200, res.text
+    return res.json()["upload_id"]
+
+
+def _put(client, upload_id, offset, chunk, checksum=None):
+    return client.put(f"/projects/1/uploads/{upload_id}", content=chunk, headers={
+        "Upload-Offset": str(offset),
+        "Upload-Checksum": checksum or hashlib.sha256(chunk).hexdigest(),
+    })
+
+
+def _upload(client, data, split_points, center_name="高雄榮總"):
+    upload_id = _create(client, data, center_name)
+    bounds = [0] + split_points + [len(data)]
+    for start, end in zip(bounds, bounds[1:]):
+        res = _put(client, upload_id, start, data[start:end])
+        assert res.status_code == 200, res.text
+    return upload_id, client.post(f"/projects/1/uploads/{upload_id}/finalize")
+
+
+def _stored_data(session_factory, center_name):
+    db = session_factory()
+    try:
+        return db.query(models.Submission).filter(models.Submission.center_name == center_name).one().data
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("data", [MIXED_CSV, b"code,v\nTrue,1\nFalse,2\nmaybe,3\n"])
+def test_mixed_types_across_chunks_match_single_request(client, session_factory, data):
+    # Split after the first data row so the first chunk looks all-numeric or all-boolean
+    _, res = _upload(client, data, [data.index(b"\n", data.index(b"\n") + 1) + 1])
+    assert res.status_code == 200, res.text
+
+    single = client.post("/projects/1/submissions", data={"center_name": "台中榮總", "uploader_name": "tester"},
+                         files={"file": ("data.csv", data, "text/csv")})
+    assert single.status_code == 200, single.text
+
+    chunked_rows = _stored_data(session_factory, "高雄榮總")
+    assert chunked_rows == _stored_data(session_factory, "台中榮總")
+    assert res.json()["validation_report"] == single.json()["validation_report"]
+
+
+def test_leading_zeros_preserved(client, session_factory):
+    _, res = _upload(client, MIXED_CSV, [len(b"code,v\n007,1\n")])
+    assert res.status_code == 200, res.text
+    assert [row["code"] for row in _stored_data(session_factory, "高雄榮總")] == ["007", "008", "A12"]
+
+
+def test_offset_mismatch_returns_409(client):
+    upload_id = _create(client, MIXED_CSV)
+    res = _put(client, upload_id, 5, MIXED_CSV[5:10])
+    assert res.status_code == 409
+    assert client.get(f"/projects/1/uploads/{upload_id}").json()["offset"] == 0
+
+
+def test_checksum_mismatch_returns_400(client):
+    upload_id = _create(client, MIXED_CSV)
+    res = _put(client, upload_id, 0, MIXED_CSV[:10], checksum="0" * 64)
+    assert res.status_code == 400
+    assert "檢查碼" in res.json()["detail"]
+    # The session survives so the chunk can be resent
+    assert _put(client, upload_id, 0, MIXED_CSV[:10]).status_code == 200
+
+
+def test_finalize_before_complete_returns_409(client):
+    upload_id = _create(client, MIXED_CSV)
+    assert _put(client, upload_id, 0, MIXED_CSV[:10]).status_code == 200
+    res = client.post(f"/projects/1/uploads/{upload_id}/finalize")
+    assert res.status_code == 409
+    assert client.get(f"/projects/1/uploads/{upload_id}").json()["offset"] == 10
+
+
+def test_resume_after_state_lost(client, session_factory):
+    upload_id = _create(client, MIXED_CSV)
+    assert _put(client, upload_id, 0, MIXED_CSV[:13]).status_code == 200
+
+    # Simulate a restart: in-memory parser and validator are gone, only the staged file remains
+    chunked_upload._states.clear()
+    offset = client.get(f"/projects/1/uploads/{upload_id}").json()["offset"]
+    assert offset == 13
+
+    res = _put(client, upload_id, offset, MIXED_CSV[offset:])
+    assert res.status_code == 200
+    assert res.json()["rows_parsed"] == 3
+
+    res = client.post(f"/projects/1/uploads/{upload_id}/finalize")
+    assert res.status_code == 200, res.text
+    assert res.json()["file_stats"]["row_count"] == 3
+
+
+def test_sensitive_column_rejected_when_header_arrives(client):
+    data = b"patient_name,v\nA,1\nB,2\n"
+    upload_id = _create(client, data)
+    res = _put(client, upload_id, 0, data[:20])
+    assert res.status_code == 400
+    assert "敏感" in res.json()["detail"]
+    assert client.get(f"/projects/1/uploads/{upload_id}").status_code == 404
+
+
+def test_extra_field_rejected_during_upload(client):
+    data = b"code,v\n1,2\n3,4,5\n"
+    upload_id = _create(client, data)
+    assert _put(client, upload_id, 0, data[:11]).status_code == 200
+    res = _put(client, upload_id, 11, data[11:])
+    assert res.status_code == 400
+    assert "Expected 2 fields" in res.json()["detail"]
+
+
+def test_cleanup_expired_sessions(client):
+    upload_id = _create(client, MIXED_CSV)
+    meta_path = chunked_upload.UPLOADS_DIR / upload_id / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    meta["updated_at"] = time.time() - chunked_upload.SESSION_TTL_SECONDS - 1
+    meta_path.write_text(json.dumps(meta))
+
+    assert chunked_upload.cleanup_expired_sessions() == 1
+    assert not (chunked_upload.UPLOADS_DIR / upload_id).exists()
+    assert upload_id not in chunked_upload._states
+
+
+def test_unknown_session_does_not_create_lock(client):
+    assert _put(client, "f" * 32, 0, b"x").status_code == 404
+    assert client.post(f"/projects/1/uploads/{'e' * 32}/finalize").status_code == 404
+    assert client.post("/projects/1/uploads/not-an-id/finalize").status_code == 404
+    assert chunked_upload._locks == {}
+
+
+def test_oversized_chunk_rejected(client, monkeypatch):
+    monkeypatch.setattr(chunked_upload, "MAX_CHUNK_SIZE", 8)
+    upload_id = _create(client, MIXED_CSV)
+    assert _put(client, upload_id, 0, MIXED_CSV[:9]).status_code == 413
+
+
+def test_oversized_upload_rejected(client, monkeypatch):
+    monkeypatch.setattr(chunked_upload, "MAX_UPLOAD_SIZE", 8)
+    res = client.post("/projects/1/uploads", json={
+        "center_name": "高雄榮總", "uploader_name": "tester", "filename": "data.csv", "total_size": 9,
+    })
+    assert res.status_code == 413
+
+
+def test_finalize_server_error_keeps_session(client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    upload_id = _create(client, MIXED_CSV)
+    assert _put(client, upload_id, 0, MIXED_CSV).status_code == 200
+
+    with monkeypatch.context() as m:
+        m.setattr(upload, "_save_submission", fail)
+        assert client.post(f"/projects/1/uploads/{upload_id}/finalize").status_code == 500
+
+    assert client.get(f"/projects/1/uploads/{upload_id}").status_code == 200
+    assert client.post(f"/projects/1/uploads/{upload_id}/finalize").status_code == 200
+    assert client.get(f"/projects/1/uploads/{upload_id}").status_code == 404
@@ -0,0 +1,64 @@
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services import validation
+from services.chunked_upload import IncrementalCsvParser
+
+SCHEMA = {
+    "columns": [
+        {"name": "code", "type": "string", "format": r"^\d+$"},
+        {"name": "grade", "type": "int", "min": 1, "max": 3, "allowed_values": [1, 2, 3]},
+        {"name": "flag", "type": "string", "allowed_values": ["True", "False"]},
+        {"name": "size", "type": ["int", "float"], "max": 10},
+        {"name": "op_date", "type": "date"},
+        {"name": "bad_format", "format": "["},
+        {"name": "missing", "required": True},
+    ]
+}
+
+# Column types change from chunk to chunk, so each batch infers different dtypes
+MIXED_CSV = (
+    b"code,grade,flag,size,op_date,bad_format\n"
+    b"007,1,True,1,2024-01-01,x\n"
+    b"008,2,False,2.5,2024-01-02,y\n"
+    b"A12,,maybe,12,2024-01-03,z\n"
+    b"013,5,True,x,2024/01/04,\n"
+    b"014,3.0,False,3,,w\n"
+)
+
+MIXED_CHUNK_SIZES = [1, 5, 30, 60, 1024]
+
+
+def _validate_in_chunks(data: bytes, chunk_size: int, schema: dict):
+    validator = validation.IncrementalValidator(schema)
+    parser = IncrementalCsvParser(on_batch=validator.add_batch)
+    for i in range(0, len(data), chunk_size):
+        parser.feed(data[i:i + chunk_size])
+    parser.finish()
+    return validator.finish(pd.read_csv(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("chunk_size", MIXED_CHUNK_SIZES)
+def test_incremental_report_matches_whole_file(chunk_size):
+    expected = validation.validate_dataframe(pd.read_csv(io.BytesIO(MIXED_CSV)), SCHEMA)
+    assert _validate_in_chunks(MIXED_CSV, chunk_size, SCHEMA) == expected
+
+
+@pytest.mark.parametrize("chunk_size", MIXED_CHUNK_SIZES)
+def test_incremental_report_matches_for_consistent_types(chunk_size):
+    data = b"code,grade,flag,size\n" + b"".join(
+        f"{i:03d},{i % 5},{i % 2 == 0},{i / 4}\n".encode() for i in range(200)
+    )
+    expected = validation.validate_dataframe(pd.read_csv(io.BytesIO(data)), SCHEMA)
+    assert not expected[0]
+    assert _validate_in_chunks(data, chunk_size, SCHEMA) == expected
+
+
+def test_schema_without_columns():
+    assert _validate_in_chunks(b"a\n1\n", 1, {}) == validation.validate_dataframe(pd.DataFrame({"a": [1]}), {})
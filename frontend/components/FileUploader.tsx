@@ -10,6 +10,33 @@ interface Project {
     name: string;
 }
 
+interface UploadSession {
+    upload_id: string;
+    offset: number;
+    total_size: number;
+    chunk_size: number;
+}
+
+const MAX_CHUNK_RETRIES = 5;
+
+// Remember unfinished sessions so a reload or dropped connection resumes instead of restarting
+const sessionKey = (projectId: string, centerName: string, file: File) =>
+    `rissa-upload:${projectId}:${centerName}:${file.name}:${file.size}:${file.lastModified}`;
+
+const sha256Hex = async (buf: ArrayBuffer) => {
+    const digest = await crypto.subtle.digest('SHA-256', buf);
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+};
+
+// Network errors, server errors, checksum and offset mismatches are retried; validation errors are final
+const isRetryable = (err: any) => {
+    const status = err.response?.status;
+    if (!status || status >= 500 || status === 409) return true;
+    return status === 400 && String(err.response.data?.detail).includes('檢查碼');
+};
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
 export default function FileUploader() {
     const [projects, setProjects] = useState<Project[]>([]);
     const [projectId, setProjectId] = useState("");
@@ -17,6 +44,7 @@ export default function FileUploader() {
     const [uploaderName, setUploaderName] = useState(""); // New state
     const [file, setFile] = useState<File | null>(null);
     const [uploading, setUploading] = useState(false);
+    const [progress, setProgress] = useState(0);
     const [result, setResult] = useState<{ success: boolean, msg: string, report?: any } | null>(null);
 
     // Fetch projects on mount
@@ -42,6 +70,92 @@ export default function FileUploader() {
         }
     };
 
+    const simpleUpload = async (file: File) => {
+        const formData = new FormData();
+        formData.append('file', file);
+        formData.append('center_name', centerName);
+        formData.append('uploader_name', uploaderName);
+
+        return axios.post(`/api/projects/${projectId}/submissions`, formData, {
+            headers: { 'Content-Type': 'multipart/form-data' },
+            onUploadProgress: e => e.total && setProgress(Math.round((e.loaded / e.total) * 100))
+        });
+    };
+
+    const chunkedUpload = async (file: File) => {
+        const base = `/api/projects/${projectId}/uploads`;
+        const key = sessionKey(projectId, centerName, file);
+
+        // 1. Resume an existing session for this file, or create a new one
+        let session: UploadSession | null = null;
+        const savedId = localStorage.getItem(key);
+        if (savedId) {
+            try {
+                session = (await axios.get(`${base}/${savedId}`)).data;
+            } catch {
+                localStorage.removeItem(key);
+            }
+        }
+        if (!session) {
+            session = (await axios.post(base, {
+                center_name: centerName,
+                uploader_name: uploaderName,
+                filename: file.name,
+                total_size: file.size
+            })).data as UploadSession;
+            localStorage.setItem(key, session.upload_id);
+        }
+
+        const { upload_id, chunk_size } = session;
+        let offset = session.offset;
+        let retries = 0;
+
+        // 2. Send chunks in order; the server parses and checks each one as it arrives
+        try {
+            while (offset < file.size) {
+                const chunk = await file.slice(offset, offset + chunk_size).arrayBuffer();
+                try {
+                    const res = await axios.put(`${base}/${upload_id}`, chunk, {
+                        headers: {
+                            'Content-Type': 'application/octet-stream',
+                            'Upload-Offset': offset.toString(),
+                            'Upload-Checksum': await sha256Hex(chunk)
+                        }
+                    });
+                    offset = res.data.offset;
+                    retries = 0;
+                    setProgress(Math.round((offset / file.size) * 100));
+                } catch (err: any) {
+                    if (!isRetryable(err) || retries >= MAX_CHUNK_RETRIES) throw err;
+                    retries++;
+                    await sleep(1000 * 2 ** retries);
+                    // Resume from wherever the server actually got to
+                    offset = await axios.get(`${base}/${upload_id}`).then(r => r.data.offset, () => offset);
+                }
+            }
+        } catch (err: any) {
+            // Session is gone (rejected or expired); the next attempt must start over
+            if (err.response?.status === 400 || err.response?.status === 404) localStorage.removeItem(key);
+            throw err;
+        }
+
+        // 3. Finalize: validate and save the submission. The server keeps the session on
+        // server errors, so those are retried; rejections end the session.
+        for (retries = 0; ; retries++) {
+            try {
+                const res = await axios.post(`${base}/${upload_id}/finalize`);
+                localStorage.removeItem(key);
+                return res;
+            } catch (err: any) {
+                if (!isRetryable(err) || retries >= MAX_CHUNK_RETRIES) {
+                    if (err.response?.status && err.response.status < 500) localStorage.removeItem(key);
+                    throw err;
+                }
+                await sleep(1000 * 2 ** (retries + 1));
+            }
+        }
+    };
+
     const handleUpload = async () => {
         const missingFields = [];
         if (!file) missingFields.push("檔案 (CSV)");
@@ -56,16 +170,13 @@ export default function FileUploader() {
 
         setUploading(true);
         setResult(null);
-
-        const formData = new FormData();
-        formData.append('file', file!);
-        formData.append('center_name', centerName);
-        formData.append('uploader_name', uploaderName);
+        setProgress(0);
 
         try {
-            const res = await axios.post(`/api/projects/${projectId}/submissions`, formData, {
-                headers: { 'Content-Type': 'multipart/form-data' }
-            });
+            // Browsers without WebCrypto (plain http on non-localhost) use the single-request upload
+            const res = typeof crypto !== 'undefined' && crypto.subtle
+                ? await chunkedUpload(file!)
+                : await simpleUpload(file!);
             setResult({ success: true, msg: "上傳成功!", report: res.data });
         } catch (err: any) {
             console.error("Upload error:", err);
@@ -160,8 +271,14 @@ export default function FileUploader() {
                     </div>
 
                     <Button onClick={handleUpload} disabled={uploading || !file} className="w-full" size="lg">
-                        {uploading ? <Loader2 className="animate-spin mr-2" /> : "上傳並驗證"}
+                        {uploading ? <><Loader2 className="animate-spin mr-2" />{progress < 100 ? `${progress}%` : "驗證中..."}</> : "上傳並驗證"}
                     </Button>
+
+                    {uploading && (
+                        <div className="h-2 w-full rounded-full bg-muted overflow-hidden">
+                            <div className="h-full bg-primary transition-all" style={{ width: `${progress}%` }} />
+                        </div>
+                    )}
                 </CardContent>
             </Card>
 